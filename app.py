@@ -3,6 +3,7 @@ import logging
 
 from startup import setup_sidebar
 import imageDuplicate
+import profiling
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -25,15 +26,20 @@ def setup_session_state():
 
 
 def main():
-    setup_session_state()
-    setup_sidebar()
-    if st.session_state.immich_api_connected:
-        imageDuplicate.load_duplicates_from_server()
-        if st.session_state.duplicates:
-            imageDuplicate.display_duplicates()
-        else:
-            st.header("🥳🥳 No duplicates found! 🥳🥳")
-            st.balloons()
+    with profiling.profile_rerun():
+        with profiling.stage("setup_session_state"):
+            setup_session_state()
+        with profiling.stage("setup_sidebar"):
+            setup_sidebar()
+        if st.session_state.immich_api_connected:
+            with profiling.stage("load_duplicates"):
+                imageDuplicate.load_duplicates_from_server()
+            with profiling.stage("render"):
+                if st.session_state.duplicates:
+                    imageDuplicate.display_duplicates()
+                else:
+                    st.header("🥳🥳 No duplicates found! 🥳🥳")
+                    st.balloons()
 
 
 if __name__ == "__main__":
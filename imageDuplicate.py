@@ -1,6 +1,8 @@
 import pandas as pd
 import streamlit as st
 import immich
+import reviewState
+import profiling
 from datetime import datetime, timezone
 import logging
 logger = logging.getLogger(__name__)
@@ -62,19 +64,41 @@ def selected_metadata(assets):
     return best_image_infos["id"], image_ids_to_delete
 
 
+@profiling.callback
 def set_metadata_to_update(key: str, value):
     logger.info(f"Setting session state: metadata_to_update[{key}] = {value}")
     st.session_state.metadata_to_update[key] = value
+    save_current_draft()
 
+@profiling.callback
 def set_session_state(key: str, value):
     logger.info(f"Setting session state: {key} = {value}")
     st.session_state[key] = value
+    save_current_draft()
 
 
+@profiling.callback
 def set_state_location(latitude: str, longitude: str):
     logger.info(f"Setting metadata_to_update {latitude=} and {latitude=}")
     st.session_state.metadata_to_update["latitude"] = latitude
     st.session_state.metadata_to_update["longitude"] = longitude
+    save_current_draft()
+
+
+def save_current_draft():
+    reviewState.save_draft(get_current_duplicate_id(), st.session_state['keepImageId'], st.session_state.metadata_to_update)
+
+
+def restore_draft(duplicate_id: str) -> bool:
+    """Restore the selections of a group that was being reviewed before a restart."""
+    draft = reviewState.get_draft(duplicate_id)
+    if draft is None:
+        return False
+    logger.info(f"Restoring saved selections for duplicate group {duplicate_id}")
+    st.session_state['keepImageId'] = draft['keepImageId']
+    st.session_state["metadata_to_update"] = draft['metadata']
+    st.session_state.metadata_merged = True
+    return True
 
 
 def next_duplicate():
@@ -85,10 +109,21 @@ def next_duplicate():
         st.session_state.duplicates = None
 
 
+@profiling.callback
+def skip_duplicate():
+    reviewState.mark_processed(get_current_duplicate_id(), "skipped")
+    next_duplicate()
+
+
 def get_current_duplicate():
     return st.session_state.duplicates[st.session_state.duplicate_number]['assets']
 
 
+def get_current_duplicate_id():
+    return st.session_state.duplicates[st.session_state.duplicate_number]['duplicateId']
+
+
+@profiling.callback
 def apply_deduplicate():
     asset_id_to_update = st.session_state['keepImageId']
     if asset_id_to_update not in [asset["id"] for asset in get_current_duplicate()]:
@@ -96,8 +131,11 @@ def apply_deduplicate():
         return
     assets_to_delete = [asset["id"] for asset in get_current_duplicate() if asset["id"] != asset_id_to_update]
     logger.info(f"Applying deduplication: updating {asset_id_to_update} and deleting {assets_to_delete}")
-    immich.update_asset(asset_id_to_update, st.session_state.metadata_to_update)
-    immich.delete_assets(assets_to_delete)
+    if not immich.update_asset(asset_id_to_update, st.session_state.metadata_to_update) or not immich.delete_assets(assets_to_delete):
+        # Stay on this group and keep the selections, so the user can retry
+        save_current_draft()
+        return
+    reviewState.mark_processed(get_current_duplicate_id(), "applied", asset_id_to_update, st.session_state.metadata_to_update)
     next_duplicate()
 
 
@@ -105,7 +143,7 @@ def display_duplicates():
     progress_bar = st.progress(0, text="Processing duplicates ...")
     progress_bar.progress(st.session_state.duplicate_number / st.session_state.duplicates_count, text=f"Processing duplicates {st.session_state.duplicate_number} / {st.session_state.duplicates_count}")
     duplicate_assets = get_current_duplicate()
-    if not st.session_state.get("metadata_merged", False):
+    if not st.session_state.get("metadata_merged", False) and not restore_draft(get_current_duplicate_id()):
         selected_metadata(duplicate_assets)
     columns = st.columns(len(duplicate_assets) + 1, vertical_alignment="center")
     for column_number, asset in enumerate(duplicate_assets):
@@ -147,14 +185,30 @@ def display_duplicates():
             st.caption(f"Is Trashed: {asset['isTrashed']}")
             st.caption(f"Description: {asset['exifInfo']["description"]}")
     with columns[-1]:
-        st.button("Skip", icon=":material/double_arrow:", on_click=next_duplicate)
+        st.button("Skip permanently", icon=":material/double_arrow:", on_click=skip_duplicate,
+                  help="Do not show this duplicate group again, also after a restart. Use 'Reset review progress' in the sidebar to bring skipped groups back.")
         st.button("Apply", icon=":material/check:", on_click=apply_deduplicate)
 
 
 def load_duplicates_from_server() -> int:
+    """Load the duplicate groups, reusing the cached snapshot unless the server's set has changed.
+
+    Groups that were already applied or skipped are left out, so the review resumes
+    at the first unprocessed group.
+    """
     if st.session_state.duplicates is None:
-        print("fetching...")
+        cached_duplicates, cached_etag = reviewState.cached_duplicates()
         with st.spinner('Fetching assets from server...'):
-            st.session_state.duplicates = immich.get_duplicates()
-            st.session_state.duplicates_count = len(st.session_state.duplicates) if st.session_state.duplicates else 0
-            logging.info(f"Loaded {st.session_state.duplicates_count} assets with duplicates from server.")
+            duplicates, etag, modified = immich.get_duplicates(cached_etag if cached_duplicates is not None else None)
+        if duplicates is not None:
+            reviewState.store_duplicates(duplicates, etag)
+        elif not modified:
+            logger.info("Duplicate set on the server is unchanged, using cached snapshot.")
+            duplicates = cached_duplicates
+        elif cached_duplicates is not None:
+            logger.warning("Fetching duplicates failed, using cached snapshot.")
+            duplicates = cached_duplicates
+        st.session_state.duplicates = reviewState.unprocessed_duplicates(duplicates) if duplicates is not None else None
+        st.session_state.duplicate_number = 0
+        st.session_state.duplicates_count = len(st.session_state.duplicates) if st.session_state.duplicates else 0
+        logging.info(f"Loaded {st.session_state.duplicates_count} unprocessed assets with duplicates.")
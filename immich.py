@@ -5,11 +5,13 @@ from io import BytesIO
 from pillow_heif import register_heif_opener
 import os
 from enum import Enum
+import profiling
 import logging
 logger = logging.getLogger(__name__)
 
 
 def ping_server() -> bool:
+    profiling.count_event("http_calls")
     try:
         response = requests.get(f"{st.session_state['immich_server_url']}/api/server/ping", headers={'Accept': 'application/json'}, timeout=1000)
         if response.ok:
@@ -41,6 +43,7 @@ def fetchAssets(immich_server_url, api_key, timeout, type):
     try:
         with st.spinner('Fetching assets...'):
             # Make the HTTP GET request
+            profiling.count_event("http_calls")
             response = requests.get(asset_info_url, headers={'Accept': 'application/json', 'x-api-key': api_key}, verify=False, timeout=timeout)
             response.raise_for_status()  # This will raise an exception for HTTP errors
             
@@ -106,30 +109,46 @@ def get_asset_info(asset_id: str) -> dict | None:
     return None
 
 
-def delete_assets(asset_ids: list[str]):
+def delete_assets(asset_ids: list[str]) -> bool:
     payload = json.dumps({
         "ids": asset_ids
     })
     result = delete_authenticated_api("assets", payload)
+    if result is None:
+        st.error(f"Failed to delete assets {asset_ids}, see the log for details.")
+        return False
     if result.status_code != 204:
         st.error(f"Failed to delete assets: {result.status_code} - {result.text}")
+        return False
+    return True
 
 
-def update_asset(asset_id, metadata_to_update: dict):
+def update_asset(asset_id, metadata_to_update: dict) -> bool:
     payload = json.dumps(metadata_to_update)
     result = put_authenticated_api(f"assets/{asset_id}", payload=payload)
-    if result:
-        logger.debug(f"Update asset resulted in: {result.json()}")
+    if result is None:
+        st.error(f"Failed to update asset {asset_id}, see the log for details.")
+        return False
+    logger.debug(f"Update asset resulted in: {result.json()}")
+    return True
 
 
-def get_duplicates():
-    response = get_from_authenticated_api("duplicates", accept_type="octet-stream")
-    if response:
-        return response.json()
-    return None
+def get_duplicates(etag: str | None = None) -> tuple[list | None, str | None, bool]:
+    """Fetches the duplicate groups, sending If-None-Match when an ETag is known.
+
+    Returns (duplicates, etag, modified). If the server answers 304 Not Modified,
+    duplicates is None and modified is False, the cached snapshot is still valid.
+    """
+    extra_headers = {'If-None-Match': etag} if etag else None
+    response = get_from_authenticated_api("duplicates", accept_type="octet-stream", extra_headers=extra_headers)
+    if response is None:
+        return None, None, True
+    if response.status_code == 304:
+        return None, etag, False
+    return response.json(), response.headers.get('ETag'), True
 
 
-def get_from_authenticated_api(endpoint: str, accept_type="json") -> requests.Response | None:
+def get_from_authenticated_api(endpoint: str, accept_type="json", extra_headers: dict | None = None) -> requests.Response | None:
     """Fetch data from the Immich API with API key."""
     if not st.session_state['immich_server_url'] or not st.session_state['immich_api_key']:
         logging.error(f"{st.session_state['immich_server_url']=} and {st.session_state['immich_api_key']=} must be set before making requests.")
@@ -137,6 +156,8 @@ def get_from_authenticated_api(endpoint: str, accept_type="json") -> requests.Re
     
     headers = {'Accept': f'application/{accept_type}',
                'x-api-key': st.session_state['immich_api_key']}
+    if extra_headers:
+        headers.update(extra_headers)
 
     return try_api_request("GET", endpoint, headers)
 
@@ -168,6 +189,7 @@ def delete_authenticated_api(endpoint: str, payload=None) -> requests.Response |
 
 def try_api_request(method: str, endpoint: str, headers, payload=None) -> requests.Response | None:
     url = f"{st.session_state['immich_server_url']}/api/{endpoint.lstrip('/')}"
+    profiling.count_event("http_calls")
     try:
         response = requests.request(method, url, headers=headers, data=payload, timeout=st.session_state['request_timeout'])
         logging.debug(f"Executing API call {method} {url=} with {headers=} and {payload=} returned status code: {response.status_code}")
@@ -0,0 +1,166 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import logging
+logger = logging.getLogger(__name__)
+
+# Profiling is opt-in, enable it with DEDUPER_PROFILE=1
+PROFILE_ENABLED = os.environ.get('DEDUPER_PROFILE', '').lower() in ('1', 'true', 'yes')
+# cProfile adds overhead to every timing, so it needs its own opt-in with DEDUPER_PROFILE_CPROFILE=1
+CPROFILE_ENABLED = PROFILE_ENABLED and os.environ.get('DEDUPER_PROFILE_CPROFILE', '').lower() in ('1', 'true', 'yes')
+PROFILE_DIR = os.environ.get('DEDUPER_PROFILE_DIR', 'profiles')
+DEFAULT_SLOW_RERUN_MS = 500
+RERUN_LOG_FILE = 'reruns.jsonl'
+
+# Streamlit runs every session in its own script thread, so each thread tracks its own rerun
+_local = threading.local()
+# Only one cProfile can be active in the interpreter at a time
+_cprofile_lock = threading.Lock()
+
+
+def _slow_rerun_ms() -> float:
+    value = os.environ.get('DEDUPER_PROFILE_SLOW_MS', DEFAULT_SLOW_RERUN_MS)
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Invalid DEDUPER_PROFILE_SLOW_MS={value!r}, using {DEFAULT_SLOW_RERUN_MS} ms.")
+        return DEFAULT_SLOW_RERUN_MS
+
+
+SLOW_RERUN_MS = _slow_rerun_ms() if CPROFILE_ENABLED else DEFAULT_SLOW_RERUN_MS
+# Callbacks run right before the script body, a record left by a callback longer ago belongs to an earlier run
+STALE_CALLBACK_RECORD_S = 1.0
+
+
+def _current_record() -> dict | None:
+    return getattr(_local, 'record', None)
+
+
+def _start_record() -> dict:
+    """Start a rerun record in this thread, with a cProfile if enabled and no other session holds it."""
+    record = {"started": datetime.now().isoformat(timespec='milliseconds'), "stages": {}, "counts": {"http_calls": 0, "disk_writes": 0}, "cprofile": False}
+    _local.record = record
+    _local.start = time.perf_counter()
+    _local.profiler = None
+    if CPROFILE_ENABLED and _cprofile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            _local.profiler = profiler
+            record["cprofile"] = True
+        except ValueError as e:
+            logger.warning(f"Could not start cProfile for this rerun: {e}")
+            _cprofile_lock.release()
+    return record
+
+
+def _finish_record(write: bool = True):
+    """Close the record of this thread, stopping its cProfile and releasing the lock."""
+    record = _local.record
+    profiler = _local.profiler
+    _local.record = None
+    _local.profiler = None
+    _local.callback_finished = None
+    if profiler is not None:
+        profiler.disable()
+        _cprofile_lock.release()
+    if write:
+        record["total_ms"] = round((time.perf_counter() - _local.start) * 1000, 2)
+        _write_rerun_record(record, profiler)
+
+
+def _discard_stale_record():
+    callback_finished = getattr(_local, 'callback_finished', None)
+    if _current_record() is not None and (callback_finished is None or time.perf_counter() - callback_finished > STALE_CALLBACK_RECORD_S):
+        logger.debug("Discarding a profiling record that was not finished by an earlier run.")
+        _finish_record(write=False)
+
+
+@contextmanager
+def profile_rerun():
+    """Record stage timings and event counts of one Streamlit rerun.
+
+    Every rerun is appended to reruns.jsonl in PROFILE_DIR. Work done by button
+    callbacks wrapped with callback() earlier in the same rerun is included.
+    With cProfile enabled, reruns slower than SLOW_RERUN_MS additionally get a
+    dump that can be opened with snakeviz or turned into a flame graph with flameprof.
+    """
+    if not PROFILE_ENABLED or getattr(_local, 'rerun_active', False):
+        yield
+        return
+    _discard_stale_record()
+    if _current_record() is None:
+        _start_record()
+    _local.rerun_active = True
+    try:
+        yield
+    finally:
+        _local.rerun_active = False
+        _finish_record()
+
+
+def callback(func):
+    """Count a widget callback towards the rerun it triggers.
+
+    Streamlit runs callbacks in the script thread before app.main, so the record
+    started here is picked up by the following profile_rerun. If the callback
+    raises, Streamlit skips the script body and the record is written here.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not PROFILE_ENABLED or getattr(_local, 'rerun_active', False):
+            return func(*args, **kwargs)
+        _discard_stale_record()
+        if _current_record() is None:
+            _start_record()
+        try:
+            with stage(f"callback:{func.__name__}"):
+                result = func(*args, **kwargs)
+        except BaseException as e:
+            _current_record()["error"] = f"{type(e).__name__} in callback {func.__name__}"
+            _finish_record()
+            raise
+        _local.callback_finished = time.perf_counter()
+        return result
+    return wrapper
+
+
+@contextmanager
+def stage(name: str):
+    """Time a stage of the current rerun. Nested stages are included in their parent's time."""
+    record = _current_record()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        record["stages"][name] = round(record["stages"].get(name, 0) + elapsed_ms, 2)
+
+
+def count_event(kind: str):
+    """Count an event, e.g. an HTTP call or a disk write, for the current rerun."""
+    record = _current_record()
+    if record is not None:
+        record["counts"][kind] = record["counts"].get(kind, 0) + 1
+
+
+def _write_rerun_record(record: dict, profiler: cProfile.Profile | None):
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if profiler is not None and record["total_ms"] >= SLOW_RERUN_MS:
+            profile_file = os.path.join(PROFILE_DIR, f"rerun-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.prof")
+            profiler.dump_stats(profile_file)
+            record["profile"] = profile_file
+        with open(os.path.join(PROFILE_DIR, RERUN_LOG_FILE), 'a') as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        logger.error(f"Could not write profiling data to {PROFILE_DIR}: {e}")
+    logger.info(f"Rerun took {record['total_ms']} ms, stages: {record['stages']}, counts: {record['counts']}")
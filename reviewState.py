@@ -0,0 +1,154 @@
+import streamlit as st
+import profiling
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import logging
+logger = logging.getLogger(__name__)
+
+# Progress is small and rewritten on every click, the snapshot is large and only written after a fetch
+REVIEW_PROGRESS_FILE = 'review_progress.json'
+DUPLICATES_SNAPSHOT_FILE = 'duplicates_snapshot.json'
+default_snapshot = {
+    "immich_server_url": "",
+    "etag": None,
+    "hash": None,
+    "duplicates": None,
+}
+
+# All Streamlit sessions run in the same process and share one review state
+_lock = threading.RLock()
+_progress = None
+_snapshot = None
+
+
+def _read_json(path: str) -> dict | None:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            loaded = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Could not read {path}, starting with empty review state: {e}")
+        return None
+    if not isinstance(loaded, dict):
+        logger.error(f"Could not read {path}, expected a JSON object but found {type(loaded).__name__}.")
+        return None
+    return loaded
+
+
+def _write_json(path: str, data: dict):
+    """Write data to path atomically. Failures are logged and the in-memory state is kept."""
+    profiling.count_event("disk_writes")
+    tmp_file = None
+    try:
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.abspath(path)), prefix=f"{os.path.basename(path)}.", suffix='.tmp', delete=False) as f:
+            tmp_file = f.name
+            json.dump(data, f)
+        os.replace(tmp_file, path)
+    except OSError as e:
+        logger.error(f"Could not write {path}, review progress is only kept in memory: {e}")
+        if tmp_file and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+def _server_progress() -> dict:
+    """Return the progress of the current server, loading the progress file once per process."""
+    global _progress
+    if _progress is None:
+        _progress = _read_json(REVIEW_PROGRESS_FILE) or {}
+    server_url = st.session_state.immich_server_url
+    progress = _progress.get(server_url)
+    if not isinstance(progress, dict):
+        progress = _progress[server_url] = {}
+    progress.setdefault("processed", {})
+    progress.setdefault("drafts", {})
+    return progress
+
+
+def _server_snapshot() -> dict:
+    """Return the duplicates snapshot, loading it once per process. A snapshot of another server is ignored."""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = {**default_snapshot, **(_read_json(DUPLICATES_SNAPSHOT_FILE) or {})}
+    if _snapshot["immich_server_url"] != st.session_state.immich_server_url:
+        return default_snapshot
+    return _snapshot
+
+
+@profiling.callback
+def reset_review_state():
+    """Forget all review progress of the current server, including the cached duplicates snapshot."""
+    global _snapshot
+    with _lock:
+        _server_progress().update(processed={}, drafts={})
+        _write_json(REVIEW_PROGRESS_FILE, _progress)
+        _snapshot = dict(default_snapshot)
+        try:
+            if os.path.exists(DUPLICATES_SNAPSHOT_FILE):
+                os.remove(DUPLICATES_SNAPSHOT_FILE)
+        except OSError as e:
+            logger.error(f"Could not remove {DUPLICATES_SNAPSHOT_FILE}: {e}")
+    st.session_state.duplicates = None
+    st.session_state.duplicate_number = 0
+    st.session_state.metadata_merged = False
+    st.session_state['image_files'] = {}
+
+
+def duplicates_hash(duplicates: list) -> str:
+    return hashlib.sha256(json.dumps(duplicates, sort_keys=True).encode()).hexdigest()
+
+
+def store_duplicates(duplicates: list, etag: str | None):
+    """Cache a freshly fetched duplicates payload and drop progress of groups that no longer exist."""
+    global _snapshot
+    new_hash = duplicates_hash(duplicates)
+    with _lock:
+        snapshot = _server_snapshot()
+        if new_hash == snapshot["hash"] and etag == snapshot["etag"]:
+            return
+        if new_hash != snapshot["hash"]:
+            logger.info("Duplicate set on the server has changed, updating cached snapshot.")
+            group_ids = {group['duplicateId'] for group in duplicates}
+            progress = _server_progress()
+            progress["processed"] = {group_id: decision for group_id, decision in progress["processed"].items() if group_id in group_ids}
+            progress["drafts"] = {group_id: draft for group_id, draft in progress["drafts"].items() if group_id in group_ids}
+            _write_json(REVIEW_PROGRESS_FILE, _progress)
+        _snapshot = {"immich_server_url": st.session_state.immich_server_url, "etag": etag, "hash": new_hash, "duplicates": duplicates}
+        _write_json(DUPLICATES_SNAPSHOT_FILE, _snapshot)
+
+
+def cached_duplicates() -> tuple[list | None, str | None]:
+    with _lock:
+        snapshot = _server_snapshot()
+        return snapshot["duplicates"], snapshot["etag"]
+
+
+def unprocessed_duplicates(duplicates: list) -> list:
+    with _lock:
+        processed = _server_progress()["processed"]
+        return [group for group in duplicates if group['duplicateId'] not in processed]
+
+
+def mark_processed(duplicate_id: str, action: str, keep_image_id: str | None = None, metadata: dict | None = None):
+    """Record the decision for a duplicate group so it is not shown again after a restart."""
+    with _lock:
+        progress = _server_progress()
+        progress["processed"][duplicate_id] = {"action": action, "keepImageId": keep_image_id, "metadata": dict(metadata) if metadata else None}
+        progress["drafts"].pop(duplicate_id, None)
+        _write_json(REVIEW_PROGRESS_FILE, _progress)
+
+
+def save_draft(duplicate_id: str, keep_image_id: str, metadata: dict):
+    """Remember the selections made for a group that has not been applied or skipped yet."""
+    with _lock:
+        _server_progress()["drafts"][duplicate_id] = {"keepImageId": keep_image_id, "metadata": dict(metadata)}
+        _write_json(REVIEW_PROGRESS_FILE, _progress)
+
+
+def get_draft(duplicate_id: str) -> dict | None:
+    with _lock:
+        draft = _server_progress()["drafts"].get(duplicate_id)
+        return {"keepImageId": draft["keepImageId"], "metadata": dict(draft["metadata"])} if draft else None
@@ -1,5 +1,7 @@
 import streamlit as st
 import immich
+import reviewState
+import profiling
 import json
 import os
 
@@ -31,6 +33,7 @@ def load_settings_info_streamlit():
 
 
 def save_settings():
+    profiling.count_event("disk_writes")
     with open(SETTINGS_FILE, 'w') as f:
         settings = {
             "immich_server_url": st.session_state.immich_server_url,
@@ -55,7 +58,8 @@ def setup_sidebar():
                                                            help="Enter the full URL to your immich instance, example: https://immich.mypage.com",
                                                            placeholder="https://immich.mypage.com").rstrip('/')
         if st.session_state.immich_server_url:
-            st.session_state.immich_server_reachable = immich.ping_server()
+            with profiling.stage("ping_server"):
+                st.session_state.immich_server_reachable = immich.ping_server()
             if not st.session_state.immich_server_reachable:
                 st.sidebar.error('No connection to server possible.')
 
@@ -63,7 +67,8 @@ def setup_sidebar():
             'API Key', st.session_state.immich_api_key, help="Enter your API key here. You can find it in the Immich web interface under Settings > API Keys: ")
         if st.session_state.immich_api_key:
             if st.session_state.immich_server_reachable:
-                st.session_state.immich_api_connected = immich.is_api_key_valid()
+                with profiling.stage("is_api_key_valid"):
+                    st.session_state.immich_api_connected = immich.is_api_key_valid()
                 if not st.session_state.immich_api_connected:
                     st.sidebar.error(
                         'Cannot authenticate to server with given API-Key.')
@@ -89,8 +94,11 @@ def setup_sidebar():
             st.sidebar.badge(
                 "Connected", icon=":material/check_circle:", color="green")
         
-        save_settings()
+        with profiling.stage("save_settings"):
+            save_settings()
     
     st.sidebar.markdown("---")
     st.sidebar.selectbox("Load image quality", ["Thumbnail (fast)", "Original (slow)"], key="load_image_quality",
                          help="Select the image quality to load. Thumbnail is faster but lower quality, Original is slower but full quality.")
+    st.sidebar.button("Reset review progress", icon=":material/restart_alt:", on_click=reviewState.reset_review_state,
+                      help="Forget which duplicates were already applied or skipped and fetch the duplicates from the server again.")